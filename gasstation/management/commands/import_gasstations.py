@@ -1,12 +1,42 @@
 import csv
-import time
+import io
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
 
+import requests
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import Point
-from geopy.geocoders import Nominatim
+from django.db import connection, transaction
 from gasstation.models import GasStation
+from navigation.services import station_index
+from navigation.services.geocode_cache import get_or_geocode
+
+BATCH_SIZE = 1000
+
+USER_AGENT = "gasstation_django (bouroumanamoundher@gmail.com)"
+
+# Nominatim usage policy: at most one request per second.
+DEFAULT_RATE = 1 / 1.1
+
+# Default concurrency against a self-hosted Nominatim.
+LOCAL_WORKERS = 16
+
+EXIT_RE = re.compile(r"EXIT\s*\d+[-A-Z]*", re.IGNORECASE)
+
+UPDATE_FIELDS = [
+    'name',
+    'address',
+    'city',
+    'state',
+    'rack_id',
+    'retail_price',
+    'location',
+]
 
 
 def split_address_only(address_part):
@@ -22,13 +52,10 @@ def split_address_only(address_part):
     if "&" not in address_part:
         return [address_part.strip()]
 
-    address_part = re.sub(
-        r"EXIT\s*\d+[-A-Z]*",
-        "",
-        address_part,
-        flags=re.IGNORECASE
-    )
+    address_part = EXIT_RE.sub("", address_part)
 
+    # Commas are dropped rather than split on: a single re.split on
+    # "[,&]" would also break "I-80, US-30 & SR-2" into three roads.
     address_part = address_part.replace(",", "")
 
     roads = [r.strip() for r in address_part.split("&") if r.strip()]
@@ -36,14 +63,69 @@ def split_address_only(address_part):
     return roads
 
 
-class Command(BaseCommand):
-    help = "Import gasstations from CSV and add geometry"
+class RateLimiter:
+    """
+    Thread-safe limiter spacing calls at most ``rate`` per second.
+
+    Each caller reserves the next free time slot under a lock and then
+    sleeps outside of it, so waiting threads do not block each other.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
 
-    def handle(self, *args, **kwargs):
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(slot - now)
 
-        geolocator = Nominatim(
-            user_agent="gasstation_django (bouroumanamoundher@gmail.com)"
+
+class Command(BaseCommand):
+    help = (
+        "Import gasstations from CSV and add geometry. "
+        "Geocoding uses the public Nominatim at 1 req/s unless "
+        "LOCAL_NOMINATIM_URL points at a self-hosted instance, e.g. "
+        "'docker run -e PBF_URL=https://download.geofabrik.de/"
+        "north-america/us-latest.osm.pbf -p 8080:8080 "
+        "mediagis/nominatim:4.4' with "
+        "LOCAL_NOMINATIM_URL=http://localhost:8080/search; requests to "
+        "it are not rate limited."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help=(
+                "Number of concurrent geocoding threads. Defaults to 1, "
+                f"or {LOCAL_WORKERS} with LOCAL_NOMINATIM_URL."
+            ),
         )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help=(
+                "Maximum geocoding requests per second across all workers. "
+                "The public Nominatim policy allows 1 req/s, the default; "
+                "with LOCAL_NOMINATIM_URL there is no limit unless set."
+            ),
+        )
+        parser.add_argument(
+            "--use-copy",
+            action="store_true",
+            help=(
+                "Insert new stations with PostgreSQL COPY instead of "
+                "bulk_create. Much faster for the initial import."
+            ),
+        )
+
+    def handle(self, *args, **options):
 
         csv_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)),
@@ -55,66 +137,211 @@ class Command(BaseCommand):
             self.stderr.write(f"CSV file not found at: {csv_path}")
             return
 
-        with open(csv_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+        rows = self.read_rows(csv_path)
+
+        local = bool(settings.LOCAL_NOMINATIM_URL)
+        workers = options["workers"] or (LOCAL_WORKERS if local else 1)
+        rate = options["rate"]
+        if rate is None and not local:
+            rate = DEFAULT_RATE
 
-            for row in reader:
+        geocoded = self.geocode_rows(rows, workers=workers, rate=rate)
+        self.save_stations(geocoded, use_copy=options["use_copy"])
 
-                address_part = row['Address']
-                city = row['City']
-                state = row['State']
+    def read_rows(self, csv_path):
+        """
+        Parse the CSV once into typed rows.
 
-                full_address = f"{address_part}, {city}, {state}, USA"
+        ``OPIS Truckstop ID`` and ``Rack ID`` become ``int`` and
+        ``Retail Price`` a ``Decimal``, so malformed rows are reported
+        and dropped up front instead of failing the bulk insert after
+        the (slow) geocoding phase.
+        """
+        rows = []
 
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
                 try:
-                    location = geolocator.geocode(full_address, timeout=10)
-                    if not location and "&" in address_part:
-                        self.stdout.write(f"Trying split for: {full_address}")
-                        roads = split_address_only(address_part)
-                        for road in roads:
-                            alt_address = f"{road}, {city}, {state}, USA"
-                            self.stdout.write(f"Trying: {alt_address}")
-
-                            location = geolocator.geocode(
-                                alt_address,
-                                timeout=10
-                            )
-                            if location:
-                                break
-                    if not location:
-                        city_only = f"{city}, {state}, USA"
-                        self.stdout.write(f"Trying city fallback: {city_only}")
-                        location = geolocator.geocode(
-                            city_only,
-                            timeout=10
-                        )
-                    if not location:
-                        self.stdout.write(f"Not found: {full_address}")
-                        continue
-                    point = Point(
-                        location.longitude,
-                        location.latitude
-                    )
-                    GasStation.objects.update_or_create(
-                        opis_id=row['OPIS Truckstop ID'],
-                        defaults={
-                            'name': row['Truckstop Name'],
-                            'address': address_part,
-                            'city': city,
-                            'state': state,
-                            'rack_id': row['Rack ID'],
-                            'retail_price': row['Retail Price'],
-                            'location': point,
-                        }
-                    )
-
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Saved: {row['Truckstop Name']}"
-                        )
-                    )
-
-                    time.sleep(1.1)
-
-                except Exception as e:
-                    self.stderr.write(str(e))
+                    row['OPIS Truckstop ID'] = int(row['OPIS Truckstop ID'])
+                    row['Rack ID'] = int(row['Rack ID'])
+                    row['Retail Price'] = Decimal(row['Retail Price'])
+                except (ValueError, InvalidOperation) as e:
+                    self.stderr.write(f"Skipping line {line}: {e}")
+                    continue
+                rows.append(row)
+
+        return rows
+
+    def geocode_rows(self, rows, workers=1, rate=DEFAULT_RATE):
+        """
+        Phase 1 — resolve every CSV row to a Point.
+
+        Rows are geocoded by a thread pool sharing one keep-alive
+        ``requests.Session``; a global rate limiter keeps the combined
+        request rate within the geocoder's policy (``rate=None`` disables
+        it).  Requests go to ``LOCAL_NOMINATIM_URL`` when set, otherwise
+        ``NOMINATIM_URL``.  Lookups go through the persistent geocode
+        cache, so only misses reach the network.
+
+        Returns a list of ``(row, point)`` tuples in CSV order; rows that
+        could not be geocoded are skipped.
+        """
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        url = settings.LOCAL_NOMINATIM_URL or settings.NOMINATIM_URL
+        limiter = RateLimiter(rate) if rate else None
+
+        def lookup(address):
+            if limiter:
+                limiter.wait()
+            response = session.get(
+                url,
+                params={"q": address, "format": "json", "limit": 1},
+                timeout=10,
+            )
+            response.raise_for_status()
+            results = response.json()
+            if not results:
+                return None
+            return float(results[0]["lat"]), float(results[0]["lon"])
+
+        def geocode_row(row):
+            try:
+                return self.geocode_row(row, lookup)
+            except Exception as e:
+                self.stderr.write(str(e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(geocode_row, row) for row in rows]
+            results = [future.result() for future in futures]
+
+        return [result for result in results if result]
+
+    def geocode_row(self, row, lookup):
+        """
+        Geocode a single CSV row, falling back to the individual roads
+        of an intersection and finally to the city centre.
+
+        Returns ``(row, point)`` or ``None`` when nothing matched.
+        """
+        address_part = row['Address']
+        city = row['City']
+        state = row['State']
+
+        full_address = f"{address_part}, {city}, {state}, USA"
+
+        coords = get_or_geocode(full_address, lookup)
+        if not coords and "&" in address_part:
+            self.stdout.write(f"Trying split for: {full_address}")
+            roads = split_address_only(address_part)
+            for road in roads:
+                alt_address = f"{road}, {city}, {state}, USA"
+                self.stdout.write(f"Trying: {alt_address}")
+
+                coords = get_or_geocode(alt_address, lookup)
+                if coords:
+                    break
+        if not coords:
+            city_only = f"{city}, {state}, USA"
+            self.stdout.write(f"Trying city fallback: {city_only}")
+            coords = get_or_geocode(city_only, lookup)
+        if not coords:
+            self.stdout.write(f"Not found: {full_address}")
+            return None
+
+        self.stdout.write(f"Geocoded: {row['Truckstop Name']}")
+        lat, lng = coords
+        return row, Point(lng, lat)
+
+    def save_stations(self, geocoded, use_copy=False):
+        """
+        Phase 2 — persist geocoded rows with batched queries.
+
+        Existing primary keys are loaded in a single query so the rows
+        can be split into ``bulk_create`` and ``bulk_update`` batches
+        instead of one ``update_or_create`` round-trip per row.  When the
+        CSV lists the same OPIS id more than once, the last row wins.
+
+        With ``use_copy`` the new rows are streamed through ``COPY FROM
+        STDIN`` rather than multi-row INSERTs.
+        """
+        stations = {}
+        for row, point in geocoded:
+            opis_id = row['OPIS Truckstop ID']
+            stations[opis_id] = GasStation(
+                opis_id=opis_id,
+                name=row['Truckstop Name'],
+                address=row['Address'],
+                city=row['City'],
+                state=row['State'],
+                rack_id=row['Rack ID'],
+                retail_price=row['Retail Price'],
+                location=point,
+            )
+
+        existing = set(
+            GasStation.objects.filter(
+                opis_id__in=stations.keys()
+            ).values_list('opis_id', flat=True)
+        )
+
+        to_create = [s for pk, s in stations.items() if pk not in existing]
+        to_update = [s for pk, s in stations.items() if pk in existing]
+
+        with transaction.atomic():
+            if use_copy:
+                self.copy_stations(to_create)
+            else:
+                GasStation.objects.bulk_create(
+                    to_create, batch_size=BATCH_SIZE
+                )
+            GasStation.objects.bulk_update(
+                to_update, UPDATE_FIELDS, batch_size=BATCH_SIZE
+            )
+
+        # Bulk writes send no signals; tell running servers to reload.
+        station_index.invalidate()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved: {len(to_create)} created, {len(to_update)} updated"
+            )
+        )
+
+    def copy_stations(self, stations):
+        """
+        Insert *stations* with a single ``COPY ... FROM STDIN``.
+
+        Rows are written as CSV into an in-memory buffer; the location
+        is sent as EWKT, which PostGIS parses straight into the
+        geography column.
+        """
+        if not stations:
+            return
+
+        fields = ['opis_id'] + UPDATE_FIELDS
+        columns = [GasStation._meta.get_field(f).column for f in fields]
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for s in stations:
+            writer.writerow([
+                s.opis_id,
+                s.name,
+                s.address,
+                s.city,
+                s.state,
+                s.rack_id,
+                s.retail_price,
+                f"SRID=4326;POINT({s.location.x} {s.location.y})",
+            ])
+        buf.seek(0)
+
+        sql = (
+            f"COPY {connection.ops.quote_name(GasStation._meta.db_table)} "
+            f"({', '.join(connection.ops.quote_name(c) for c in columns)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buf)
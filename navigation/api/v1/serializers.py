@@ -18,6 +18,11 @@ class FuelStopSerializer(serializers.Serializer):
 
 
 class NavigationOutputSerializer(serializers.Serializer):
+    """
+    Documents the response shape.  The views return the service result
+    directly rather than re-serializing it field by field.
+    """
+
     fuel_stops = FuelStopSerializer(many=True)
     total_fuel_cost = serializers.FloatField()
     total_distance = serializers.FloatField()
@@ -4,8 +4,8 @@ from rest_framework import status
 
 from django.conf import settings
 
-from .serializers import NavigationInputSerializer, NavigationOutputSerializer
-from navigation.services import geocoding, provider_call, stations, optimizer, map_renderer
+from .serializers import NavigationInputSerializer
+from navigation.services import geocoding, provider_call, stations, optimizer, map_renderer, station_index
 
 import logging
 
@@ -21,8 +21,10 @@ class NavigationView(APIView):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             data = serializer.validated_data
-            start=geocoding.geocode(data["start"])
-            end=geocoding.geocode(data["end"])
+            # Load the station index (if stale) while geocoding and OSRM
+            # are in flight.
+            station_index.prefetch()
+            start, end = geocoding.geocode_many([data["start"], data["end"]])
             #for testing
             #start =(41.8781, -87.6298)
             #end = (35.2271, -80.8431)
@@ -33,10 +35,16 @@ class NavigationView(APIView):
                 end_lng=end[1],
             )
 
-            route_stations = stations.get_stations_along_route(
-                route_points=route["points"],
-                cumulative_distances=route["cumulative_distances"],
-            )
+            # A route within one tank needs no stops, so the station
+            # lookup is skipped and the optimizer takes its fast path.
+            route_stations = []
+            if optimizer.needs_stops(
+                route["total_distance_miles"], data.get("max_range")
+            ):
+                route_stations = stations.get_stations_along_route(
+                    route_points=route["points"],
+                    cumulative_distances=route["cumulative_distances"],
+                )
 
             result = optimizer.optimize_fuel_stops(
                 stations=route_stations,
@@ -50,13 +58,15 @@ class NavigationView(APIView):
             map_path = map_renderer.render_route_map(
                 encoded_polyline=route["encoded_polyline"],
                 fuel_stops=result["fuel_stops"],
+                points=route["points"],
             )
             result["route_map"] = request.build_absolute_uri(
                 settings.MEDIA_URL + map_path
             )
 
-            output = NavigationOutputSerializer(result)
-            return Response(output.data, status=status.HTTP_200_OK)
+            # ``result`` already holds plain primitives in the shape of
+            # NavigationOutputSerializer, so it is rendered as-is.
+            return Response(result, status=status.HTTP_200_OK)
 
         except ValueError as e:
             logger.warning("Validation error: %s", e)
@@ -18,6 +18,11 @@ class FuelStopSerializer(serializers.Serializer):
 
 
 class NavigationOutputSerializer(serializers.Serializer):
+    """
+    Documents the response shape.  The views return the service result
+    directly rather than re-serializing it field by field.
+    """
+
     total_distance_miles = serializers.FloatField()
     total_fuel_cost = serializers.FloatField()
     total_gallons = serializers.FloatField()
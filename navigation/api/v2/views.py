@@ -2,8 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .serializers import NavigationInputSerializer, NavigationOutputSerializer
-from navigation.services import geocoding, provider_call, stations, optimizer, map_renderer
+from .serializers import NavigationInputSerializer
+from navigation.services import geocoding, provider_call, stations, optimizer, map_renderer, station_index
 
 import logging
 
@@ -24,7 +24,9 @@ class NavigationView(APIView):
        (start → stop₁ → stop₂ → … → end) to get the real driving
        distance and production-ready polyline that includes detours.
     6. Return response with real distance / polyline from the second call
-       while keeping the DP-optimal fuel cost.
+       while keeping the DP-optimal fuel cost.  The route map is rendered
+       in the background; ``route_map`` is the path it will be saved to
+       (``<path>.failed`` appears instead if rendering fails).
     """
 
     def post(self, request):
@@ -35,8 +37,10 @@ class NavigationView(APIView):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             data = serializer.validated_data
-            start=geocoding.geocode(data["start"])
-            end=geocoding.geocode(data["end"])
+            # Load the station index (if stale) while geocoding and OSRM
+            # are in flight.
+            station_index.prefetch()
+            start, end = geocoding.geocode_many([data["start"], data["end"]])
             #for testing
             #start =(41.8781, -87.6298)
             #end = (35.2271, -80.8431)
@@ -47,10 +51,16 @@ class NavigationView(APIView):
                 end_lng=end[1],
             )
 
-            route_stations = stations.get_stations_along_route_v2(
-                route_points=route["points"],
-                cumulative_distances=route["cumulative_distances"],
-            )
+            # A route within one tank needs no stops, so the station
+            # lookup is skipped and the optimizer takes its fast path.
+            route_stations = []
+            if optimizer.needs_stops(
+                route["total_distance_miles"], data.get("max_range")
+            ):
+                route_stations = stations.get_stations_along_route_v2(
+                    route_points=route["points"],
+                    cumulative_distances=route["cumulative_distances"],
+                )
 
             dp_result = optimizer.optimize_fuel_stops(
                 stations=route_stations,
@@ -70,9 +80,11 @@ class NavigationView(APIView):
                 validated = provider_call.get_route_with_waypoints(waypoints)
                 real_distance = validated["total_distance_miles"]
                 real_polyline = validated["route_polyline"]
+                real_points = None
             else:
                 real_distance = route["total_distance_miles"]
                 real_polyline = route["encoded_polyline"]
+                real_points = route["points"]
 
             result = {
                 "total_distance_miles": round(real_distance, 1),
@@ -80,14 +92,16 @@ class NavigationView(APIView):
                 "total_gallons": dp_result["total_gallons"],
                 "fuel_stops": fuel_stops,
                 "route_polyline": real_polyline,
-                "route_map": map_renderer.render_route_map(
+                "route_map": map_renderer.render_route_map_async(
                     encoded_polyline=real_polyline,
                     fuel_stops=fuel_stops,
+                    points=real_points,
                 ),
             }
 
-            output = NavigationOutputSerializer(result)
-            return Response(output.data, status=status.HTTP_200_OK)
+            # ``result`` already holds plain primitives in the shape of
+            # NavigationOutputSerializer, so it is rendered as-is.
+            return Response(result, status=status.HTTP_200_OK)
 
         except ValueError as e:
             logger.warning("Validation error: %s", e)
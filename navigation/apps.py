@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NavigationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "navigation"
+
+    def ready(self):
+        # Connect the station index invalidation signals.
+        from .services import station_index  # noqa: F401
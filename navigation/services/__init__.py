@@ -1,6 +1,9 @@
 from .  import geocoding
+from . import geocode_cache
 from . import provider_call
+from . import route_cache
 from . import helper
+from . import station_index
 from . import converter
 from . import stations
 from . import optimizer
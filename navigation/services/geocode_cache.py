@@ -0,0 +1,81 @@
+"""Persistent geocode cache — remember ``address -> (lat, lng)`` lookups
+on disk so repeated addresses never hit Nominatim twice.
+
+Backed by the ``geocode`` entry of ``settings.CACHES`` (a file-based
+cache), so results survive restarts and re-imports.  A small in-process
+LRU sits in front of it so hot addresses skip the file read as well.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+Coords = tuple[float, float]
+
+# Most recently used coordinates per cache key, in this process only.
+LOCAL_SIZE = 4096
+_local: OrderedDict[str, Coords] = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def normalize(address: str) -> str:
+    """Lower-case and collapse whitespace so trivial variants share a key."""
+    return " ".join(address.lower().split())
+
+
+def cache_key(address: str) -> str:
+    digest = hashlib.blake2b(normalize(address).encode()).hexdigest()
+    return f"geo:{digest}"
+
+
+def get_or_geocode(
+    address: str,
+    lookup: Callable[[str], Coords | None],
+) -> Coords | None:
+    """
+    Return cached coordinates for *address*, calling *lookup* on a miss.
+
+    Parameters
+    ----------
+    address :
+        Free-form address string.
+    lookup :
+        Callable performing the real geocode; returns ``(lat, lng)`` or
+        ``None`` when the address cannot be resolved.
+
+    Returns
+    -------
+    tuple[float, float] | None
+        ``(lat, lng)`` or ``None`` if the address could not be geocoded.
+        Failed lookups are not cached.
+    """
+    key = cache_key(address)
+
+    with _local_lock:
+        coords = _local.get(key)
+        if coords is not None:
+            _local.move_to_end(key)
+            return coords
+
+    cache = caches["geocode"]
+    coords = cache.get(key)
+    if coords is not None:
+        logger.debug("Geocode cache hit: %s", address)
+    else:
+        coords = lookup(address)
+        if coords is None:
+            return None
+        cache.set(key, coords, settings.GEOCODE_CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local[key] = coords
+        if len(_local) > LOCAL_SIZE:
+            _local.popitem(last=False)
+    return coords
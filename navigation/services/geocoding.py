@@ -1,10 +1,13 @@
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderServiceError
 from django.conf import settings
 
+from .geocode_cache import get_or_geocode
+
 logger = logging.getLogger(__name__)
 
 geolocator = Nominatim(
@@ -15,6 +18,19 @@ geolocator = Nominatim(
 MAX_RETRIES = 3
 RETRY_DELAY = 2 
 
+# Shared workers for ``geocode_many``, so requests don't start threads.
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.GEOCODE_CONCURRENCY),
+    thread_name_prefix="geocode",
+)
+
+
+def _lookup(location_string: str) -> tuple[float, float] | None:
+    location = geolocator.geocode(location_string)
+    if not location:
+        return None
+    return location.latitude, location.longitude
+
 
 def geocode(location_string: str) -> tuple[float, float]:
     """
@@ -22,21 +38,19 @@ def geocode(location_string: str) -> tuple[float, float]:
     using Nominatim agent (geopy).
 
     Retries up to MAX_RETRIES times with exponential backoff
-    when Nominatim rate-limits (HTTP 509 / 429).
+    when Nominatim rate-limits (HTTP 509 / 429).  Results are served
+    from the persistent geocode cache when available.
     """
     logger.debug("Geocoding: %s", location_string)
 
     last_error = None
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            location = geolocator.geocode(location_string)
-            if not location:
+            coords = get_or_geocode(location_string, _lookup)
+            if not coords:
                 raise ValueError(f"Could not geocode location: '{location_string}'")
-            logger.debug(
-                "Geocoded '%s' -> (%s, %s)",
-                location_string, location.latitude, location.longitude,
-            )
-            return location.latitude, location.longitude
+            logger.debug("Geocoded '%s' -> (%s, %s)", location_string, *coords)
+            return coords
         except GeocoderServiceError as e:
             last_error = e
             delay = RETRY_DELAY * (2 ** (attempt - 1))
@@ -49,3 +63,18 @@ def geocode(location_string: str) -> tuple[float, float]:
     raise RuntimeError(
         f"Nominatim still rate-limiting after {MAX_RETRIES} retries: {last_error}"
     )
+
+
+def geocode_many(location_strings: list[str]) -> list[tuple[float, float]]:
+    """
+    Geocode several location strings, preserving order.
+
+    Up to ``settings.GEOCODE_CONCURRENCY`` lookups run at once, on a
+    process-wide pool of that size.  The default of 1 keeps to the
+    public Nominatim policy (sequential requests); raise it when
+    pointing at a self-hosted instance.
+    """
+    if settings.GEOCODE_CONCURRENCY <= 1 or len(location_strings) <= 1:
+        return [geocode(s) for s in location_strings]
+
+    return list(_executor.map(geocode, location_strings))
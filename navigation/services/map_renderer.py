@@ -2,19 +2,29 @@
 static image, save it to Django media storage, and return the relative path.
 
 Uses the ``staticmap`` library which fetches OSM tiles and composites
-them locally.  No API key required.
+them locally.  No API key required.  Downloaded tiles are kept in a
+size-capped LRU cache in media storage and fetched over a shared
+keep-alive session, so repeat routes over the same region skip the
+network.
 """
 
 import io
+import itertools
 import logging
+import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
-import polyline as polyline_codec
-from django.conf import settings
+import requests
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from requests.adapters import HTTPAdapter
 from staticmap import StaticMap, Line, CircleMarker
 
+from .helper import decode_polyline
+
 logger = logging.getLogger(__name__)
 
 # Map dimensions (pixels)
@@ -23,11 +33,103 @@ MAP_HEIGHT = 500
 
 # Sub-directory inside MEDIA_ROOT
 MAP_UPLOAD_DIR = "route_maps"
+TILE_CACHE_DIR = "tile_cache"
+
+# Most tiles kept in the cache (OSM tiles are ~10-30 KB), and how many
+# tile writes pass between prunes of the least recently used ones.
+TILE_CACHE_MAX_TILES = 10000
+TILE_PRUNE_INTERVAL = 100
+_tile_writes = itertools.count(1)
+_prune_lock = threading.Lock()
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+
+# Background renderer used by ``render_route_map_async``.  At most
+# ``MAX_PENDING_RENDERS`` jobs are queued or running; past that the map is
+# rendered on the calling thread instead of growing the queue.
+MAX_PENDING_RENDERS = 16
+FAILURE_SUFFIX = ".failed"
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="route-map")
+_pending = threading.BoundedSemaphore(MAX_PENDING_RENDERS)
+
+
+class CachedStaticMap(StaticMap):
+    """
+    ``StaticMap`` whose tile downloads go through a persistent
+    ``requests.Session`` and a tile cache in media storage keyed on the
+    tile's ``{z}/{x}/{y}.png`` path.
+
+    Reads bump a tile's modification time and writes periodically evict
+    the least recently used tiles beyond ``TILE_CACHE_MAX_TILES``.  On
+    storage without local paths, tiles age from when they were written.
+    """
+
+    def get(self, url, **kwargs):
+        path = f"{TILE_CACHE_DIR}{urlparse(url).path}"
+
+        if default_storage.exists(path):
+            _touch(path)
+            with default_storage.open(path, "rb") as f:
+                return 200, f.read()
+
+        res = _session.get(url, **kwargs)
+        if res.status_code == 200:
+            saved = default_storage.save(path, ContentFile(res.content))
+            if saved != path:
+                # Another render cached the same tile first and storage
+                # picked a suffixed name; keep theirs, drop the copy.
+                default_storage.delete(saved)
+            if next(_tile_writes) % TILE_PRUNE_INTERVAL == 0:
+                _prune_tile_cache()
+        return res.status_code, res.content
+
+
+def _touch(path):
+    try:
+        os.utime(default_storage.path(path))
+    except (NotImplementedError, OSError):
+        pass
+
+
+def _tile_paths(directory=TILE_CACHE_DIR):
+    dirs, files = default_storage.listdir(directory)
+    for name in files:
+        yield f"{directory}/{name}"
+    for name in dirs:
+        yield from _tile_paths(f"{directory}/{name}")
+
+
+def _prune_tile_cache():
+    """Delete the least recently used tiles beyond ``TILE_CACHE_MAX_TILES``."""
+    if not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        tiles = []
+        for path in _tile_paths():
+            try:
+                tiles.append((default_storage.get_modified_time(path), path))
+            except OSError:
+                pass  # deleted by another process meanwhile
+        excess = len(tiles) - TILE_CACHE_MAX_TILES
+        if excess <= 0:
+            return
+
+        tiles.sort()
+        for _, path in tiles[:excess]:
+            default_storage.delete(path)
+        logger.debug("Evicted %d cached map tiles", excess)
+    except Exception as e:
+        logger.warning("Tile cache prune failed: %s", e)
+    finally:
+        _prune_lock.release()
 
 
 def render_route_map(
     encoded_polyline: str,
     fuel_stops: list[dict] | None = None,
+    filename: str | None = None,
+    points=None,
 ) -> str:
     """
     Render the route polyline (and optional fuel-stop markers) onto a
@@ -40,21 +142,28 @@ def render_route_map(
         Google-encoded polyline string.
     fuel_stops :
         Optional list of stop dicts, each with ``lat`` and ``lng`` keys.
+    filename :
+        Optional target path inside MEDIA_ROOT.  A random name under
+        ``MAP_UPLOAD_DIR`` is used when omitted.
+    points :
+        The polyline already decoded as ``(lat, lng)`` rows, e.g. the
+        ``points`` of ``provider_call.get_route``.  Skips decoding
+        *encoded_polyline* again when given.
 
     Returns
     -------
     str
         Relative path inside MEDIA_ROOT.
     """
-    # Decode polyline
-    points = polyline_codec.decode(encoded_polyline)
+    if points is None:
+        points = decode_polyline(encoded_polyline)
 
-    m = StaticMap(
+    m = CachedStaticMap(
         MAP_WIDTH, MAP_HEIGHT,
         url_template="https://tile.openstreetmap.org/{z}/{x}/{y}.png",
     )
 
-    route_coords = [(lng, lat) for lat, lng in points]
+    route_coords = [(lng, lat) for lat, lng in points.tolist()]
     m.add_line(Line(route_coords, color="blue", width=3))
 
     if route_coords:
@@ -69,11 +178,58 @@ def render_route_map(
     image = m.render()
 
     buf = io.BytesIO()
-    image.save(buf, format="PNG")
+    image.save(buf, format="PNG", compress_level=1)
     buf.seek(0)
 
-    filename = f"{MAP_UPLOAD_DIR}/{uuid.uuid4().hex}.png"
+    if filename is None:
+        filename = _new_map_filename()
     saved_path = default_storage.save(filename, ContentFile(buf.read()))
 
     logger.debug("Saved route map: %s", saved_path)
     return saved_path
+
+
+def render_route_map_async(
+    encoded_polyline: str,
+    fuel_stops: list[dict] | None = None,
+    points=None,
+) -> str:
+    """
+    Schedule ``render_route_map`` on a background thread and return the
+    relative path the image will be written to.
+
+    The tile downloads and PNG encoding no longer block the response;
+    clients poll the returned path until the image exists.  If rendering
+    fails, ``<path>.failed`` is written instead (holding the error), so
+    pollers can stop.  When ``MAX_PENDING_RENDERS`` jobs are already
+    queued the map is rendered inline before returning.
+    """
+    filename = _new_map_filename()
+    if not _pending.acquire(blocking=False):
+        logger.warning("Route map queue full; rendering inline")
+        return render_route_map(encoded_polyline, fuel_stops, filename, points)
+
+    future = _executor.submit(
+        render_route_map, encoded_polyline, fuel_stops, filename, points,
+    )
+    future.add_done_callback(lambda f: _finish_render(f, filename))
+    return filename
+
+
+def _new_map_filename() -> str:
+    return f"{MAP_UPLOAD_DIR}/{uuid.uuid4().hex}.png"
+
+
+def _finish_render(future, filename):
+    _pending.release()
+    error = future.exception()
+    if error is None:
+        return
+
+    logger.error("Route map rendering failed: %s", error)
+    try:
+        default_storage.save(
+            filename + FAILURE_SUFFIX, ContentFile(str(error).encode()),
+        )
+    except Exception as e:
+        logger.error("Could not write route map failure marker: %s", e)
@@ -2,19 +2,114 @@
 Forward Dynamic Programming optimizer for globally optimal fuel cost.
 
 The route is fixed.  We optimise fuel purchase decisions only.
-Stations are ordered by ``distance_from_start`` along the route.
+Stations are ordered by ``distance_from_start`` along the route, and the
+DP runs over parallel distance / price sequences rather than per-node
+dicts.
 The algorithm computes the globally minimal fuel cost to reach the destination.
 """
 
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 
+import numpy as np
 from django.conf import settings
+from django.core.cache import cache
+from numba import njit
+
+from .stations import StationBatch
 
 logger = logging.getLogger(__name__)
 
+# Results of recent optimizations, keyed by a digest of the DP inputs.
+# Prices are part of the key, so a price update simply misses.  Misses
+# fall through to the shared default cache before running the DP, so
+# every worker benefits from a hot route.
+MEMO_SIZE = 128
+_memo: OrderedDict[bytes, dict] = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+@njit("Tuple((f8[:], i8[:]))(f8[:], f8[:], f8, f8)", cache=True, nogil=True)
+def _dp_kernel(dists, prices, max_range, mpg):
+    """
+    Forward DP over nodes sorted by distance.
+
+    ``dp[j]`` is the cheapest cost to reach node ``j`` and ``parent[j]``
+    the node it is reached from (``-1`` when unreachable), taking the
+    earliest node on ties.
+
+    Candidate predecessors are kept in a window, in node order, within
+    tank range of the current position.  Node i is dropped once a later
+    node k is at least as cheap to arrive at and strictly cheaper to buy
+    from: for every j past k, leaving from k then beats leaving from i.
+    Nodes sharing a distance are settled before any of them is added,
+    since they cannot serve each other (gap 0).
+
+    Compiled with ``nogil`` so concurrent requests on a threaded server
+    do not serialize on the GIL while the DP runs.  Not ``fastmath``:
+    that lets LLVM assume no infinities, and ``inf`` marks unreachable
+    nodes here.
+    """
+    n = dists.shape[0]
+    dp = np.full(n, np.inf)
+    parent = np.full(n, -1, dtype=np.int64)
+    dp[0] = 0.0
+
+    # window[head:tail]; every node is pushed at most once.
+    window = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+
+    j = 0
+    while j < n:
+        d = dists[j]
+        group_end = j
+        while group_end < n and dists[group_end] == d:
+            group_end += 1
+
+        while head < tail and d - dists[window[head]] > max_range:
+            head += 1
+
+        for k in range(max(j, 1), group_end):
+            best = np.inf
+            best_i = -1
+            for w in range(head, tail):
+                i = window[w]
+                candidate = dp[i] + (d - dists[i]) / mpg * prices[i]
+                if candidate < best:
+                    best = candidate
+                    best_i = i
+            dp[k] = best
+            parent[k] = best_i
+
+        for k in range(j, group_end):
+            if dp[k] == np.inf:
+                continue
+            while tail > head and prices[window[tail - 1]] > prices[k]:
+                tail -= 1
+            window[tail] = k
+            tail += 1
+
+        j = group_end
+
+    return dp, parent
+
+
+def needs_stops(total_distance: float, max_range: float | None = None) -> bool:
+    """
+    Whether a route of *total_distance* miles needs any fuel stop, i.e.
+    whether it is longer than one tank (*max_range*, default from
+    settings).  Callers use it to skip the station lookup entirely.
+    """
+    if max_range is None:
+        max_range = settings.FUEL_OPTIMIZER["MAX_RANGE_MILES"]
+    return total_distance > max_range
+
 
 def optimize_fuel_stops(
-    stations: list[dict],
+    stations: StationBatch | list[dict],
     total_distance: float,
     max_range: float | None = None,
     mpg: float | None = None,
@@ -25,8 +120,10 @@ def optimize_fuel_stops(
     Parameters
     ----------
     stations :
-        Sorted list of station dicts, each with at least:
-        ``id``, ``name``, ``lat``, ``lng``, ``price``, ``distance_from_start``.
+        Stations as a ``StationBatch`` or a list of dicts with at least
+        ``id``, ``name``, ``lat``, ``lng``, ``price``,
+        ``distance_from_start``.  Normally already sorted by
+        ``distance_from_start``; unsorted input is sorted first.
     total_distance :
         Total driving distance of the route in miles.
     max_range :
@@ -52,7 +149,7 @@ def optimize_fuel_stops(
         max_range = config["MAX_RANGE_MILES"]
     if mpg is None:
         mpg = config["MPG"]
-    if total_distance <= max_range:
+    if not needs_stops(total_distance, max_range):
         total_gallons = round(total_distance / mpg, 2)
         logger.info(
             "Route is %.1f miles (≤ %d max range) — no fuel stops needed.",
@@ -65,109 +162,144 @@ def optimize_fuel_stops(
             "total_distance": round(total_distance, 1),
             "total_gallons": total_gallons,
         }
-    nodes: list[dict] = []
-    nodes.append(
-        {
-            "id": "start",
-            "price": 0,
-            "distance_from_start": 0.0,
-            "is_virtual": True,
-        }
-    )
 
-    for s in stations:
-        nodes.append(
-            {
-                "id": s["id"],
-                "name": s.get("name", ""),
-                "lat": s.get("lat"),
-                "lng": s.get("lng"),
-                "price": s["price"],
-                "distance_from_start": s["distance_from_start"],
-                "is_virtual": False,
-            }
-        )
+    if not isinstance(stations, StationBatch):
+        stations = StationBatch.from_dicts(stations)
 
-    nodes.append(
-        {
-            "id": "destination",
-            "price": 0,
-            "distance_from_start": total_distance,
-            "is_virtual": True,
-        }
-    )
+    # The DP is only correct on ordered nodes.  Batches from the station
+    # services are already sorted, so the check is one vectorized pass
+    # and the sort only runs for out-of-order input.
+    along = stations.distance_from_start
+    if (along[1:] < along[:-1]).any():
+        logger.debug("Stations not sorted by distance_from_start; sorting")
+        stations = stations.take(np.argsort(along, kind="stable"))
 
-    n = len(nodes)
-    logger.info("DP over %d nodes (start + %d stations + destination)", n, n - 2)
+    key = _fingerprint(stations, total_distance, max_range, mpg)
+    with _memo_lock:
+        result = _memo.get(key)
+        if result is not None:
+            _memo.move_to_end(key)
+    if result is None:
+        result = _shared_result(key, stations, total_distance, max_range, mpg)
+        with _memo_lock:
+            _memo[key] = result
+            if len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+    else:
+        logger.info("Optimizer memo hit; skipping DP")
 
-    INF = float("inf")
-    dp = [INF] * n
-    parent = [-1] * n
-    dp[0] = 0.0
+    # Callers own the returned dicts; keep the memoized copy intact.
+    return {
+        **result,
+        "fuel_stops": [dict(stop) for stop in result["fuel_stops"]],
+    }
 
-    for i in range(n):
-        if dp[i] == INF:
-            continue
-        for j in range(i + 1, n):
-            gap = nodes[j]["distance_from_start"] - nodes[i]["distance_from_start"]
 
-            if gap <= 0:
-                continue
-            if gap > max_range:
-                break
+def _shared_result(key, stations, total_distance, max_range, mpg) -> dict:
+    """Look *key* up in the default cache, solving and storing on a miss."""
+    cache_key = f"optimizer:{key.hex()}"
+    try:
+        result = cache.get(cache_key)
+    except Exception as e:
+        logger.warning("Optimizer cache read failed for %s: %s", cache_key, e)
+        result = None
+    if result is not None:
+        logger.debug("Optimizer cache hit: %s", cache_key)
+        return result
 
-            fuel_needed = gap / mpg
-            fuel_cost = fuel_needed * nodes[i]["price"]
-            candidate = dp[i] + fuel_cost
+    result = _solve(stations, total_distance, max_range, mpg)
+    try:
+        cache.set(cache_key, result, settings.OPTIMIZER_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Optimizer cache write failed for %s: %s", cache_key, e)
+    return result
 
-            if candidate < dp[j]:
-                dp[j] = candidate
-                parent[j] = i
 
-    dest_idx = n - 1
-    if dp[dest_idx] == INF:
+def _fingerprint(stations: StationBatch, total_distance, max_range, mpg) -> bytes:
+    """Digest of everything the DP result depends on."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.array([total_distance, max_range, mpg], dtype=np.float64).tobytes())
+    for column in (
+        stations.ids, stations.lats, stations.lngs,
+        stations.prices, stations.distance_from_start,
+    ):
+        h.update(np.ascontiguousarray(column).tobytes())
+    return h.digest()
+
+
+def _solve(stations: StationBatch, total_distance, max_range, mpg) -> dict:
+    """Run the DP over sorted *stations* and back-trace the stops."""
+    # Node 0 is the start, nodes 1..m the stations, node m + 1 the
+    # destination.  Virtual nodes cost nothing to buy at.  Stations at or
+    # past the destination can never lead to it and are left out.
+    # The DP reads only these two parallel arrays; names and coordinates
+    # stay in ``stations`` until the back-trace.
+    m = int(np.searchsorted(stations.distance_from_start, total_distance))
+    dists = np.concatenate(
+        ([0.0], stations.distance_from_start[:m], [total_distance])
+    )
+    prices = np.concatenate(([0.0], stations.prices[:m], [0.0]))
+
+    # With sorted nodes the destination is reachable exactly when no
+    # gap between consecutive nodes exceeds the range, so infeasible
+    # routes are rejected in one pass without running the DP.
+    gaps = np.diff(dists)
+    too_far = np.flatnonzero(gaps > max_range)
+    if too_far.size:
+        k = too_far[0]
         raise ValueError(
             f"Destination is unreachable with the given tank constraint "
             f"(max range = {max_range} miles). "
-            f"There may be a gap between consecutive stations exceeding "
-            f"the vehicle range."
+            f"There is a {gaps[k]:.1f} mile gap without stations after "
+            f"mile {dists[k]:.1f}."
         )
+
+    n = len(dists)
+    logger.info("DP over %d nodes (start + %d stations + destination)", n, n - 2)
+
+    dp, parent = _dp_kernel(dists, prices, float(max_range), float(mpg))
+
+    dest_idx = n - 1
     path_indices: list[int] = []
     idx = dest_idx
     while idx != -1:
         path_indices.append(idx)
-        idx = parent[idx]
+        idx = int(parent[idx])
     path_indices.reverse()
 
     fuel_stops: list[dict] = []
-    total_gallons = 0.0
 
-    for k in range(len(path_indices) - 1):
+    # The leg from the start (node 0) is driven on the initial tank, so
+    # only the legs leaving a station become stops.
+    for k in range(1, len(path_indices) - 1):
         i = path_indices[k]
         j = path_indices[k + 1]
-        node_i = nodes[i]
-        node_j = nodes[j]
 
-        gap = node_j["distance_from_start"] - node_i["distance_from_start"]
+        gap = float(dists[j] - dists[i])
         fuel_needed = gap / mpg
-        fuel_cost = fuel_needed * node_i["price"]
-        total_gallons += fuel_needed
-
-        if not node_i["is_virtual"]:
-            fuel_stops.append(
-                {
-                    "station_id": node_i["id"],
-                    "name": node_i.get("name", ""),
-                    "lat": node_i.get("lat"),
-                    "lng": node_i.get("lng"),
-                    "distance_from_start": round(node_i["distance_from_start"], 1),
-                    "price_per_gallon": node_i["price"],
-                    "gallons": round(fuel_needed, 2),
-                    "cost": round(fuel_cost, 2),
-                }
-            )
-
-    total_cost = round(dp[dest_idx], 2)
+        fuel_cost = fuel_needed * float(prices[i])
+
+        # Read the stop straight from the batch columns; node i is
+        # station i - 1 and its distance / price are already in the
+        # node arrays.
+        row = i - 1
+        fuel_stops.append(
+            {
+                "station_id": int(stations.ids[row]),
+                "name": stations.names[row],
+                "lat": round(float(stations.lats[row]), 6),
+                "lng": round(float(stations.lngs[row]), 6),
+                "distance_from_start": round(float(dists[i]), 1),
+                "price_per_gallon": float(prices[i]),
+                "gallons": round(fuel_needed, 2),
+                "cost": round(fuel_cost, 2),
+            }
+        )
+
+    # The legs cover the route end to end, so the fuel burned is the
+    # same whichever stops were chosen.
+    total_gallons = total_distance / mpg
+    total_cost = round(float(dp[dest_idx]), 2)
     logger.info(
         "Optimal fuel cost: $%.2f  |  %d stops  |  %.1f gallons",
         total_cost,
@@ -1,20 +1,41 @@
 import logging
 
-import polyline as polyline_codec
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from . import converter
-from .helper import compute_cumulative_distances
+from .helper import decode_polyline_with_distances
+from .route_cache import cache_route, route_key, waypoints_key
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# One pooled session for every OSRM call, so requests reuse keep-alive
+# connections instead of paying a TCP/TLS handshake each time.  Brief
+# gateway errors are retried with a short backoff.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+    ),
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
 
-def get_route(
+
+@cache_route(route_key)
+def _fetch_route(
     start_lat: float,
     start_lng: float,
     end_lat: float,
     end_lng: float,
 ) -> dict:
+    """
+    OSRM request behind ``get_route``.  Only the encoded polyline and
+    the distance are returned (and cached), at a few bytes per point.
+    """
     config = settings.FUEL_OPTIMIZER
     base_url = config["OSRM_BASE_URL"]
     logger.debug("Calling OSRM API with URL: %s", base_url)
@@ -23,7 +44,7 @@ def get_route(
         "overview": "full",
         "geometries": "polyline",
     }
-    response = requests.get(url, params=params, timeout=60)
+    response = _session.get(url, params=params, timeout=60)
     response.raise_for_status()
     data = response.json()
     
@@ -32,19 +53,47 @@ def get_route(
             f"OSRM routing failed with code: {data.get('code', 'unknown')}"
         )
     route = data["routes"][0]
-    encoded_polyline = route["geometry"]
-    total_distance_miles = converter.meters_to_miles(route["distance"])
-    points = polyline_codec.decode(encoded_polyline)
-    cumulative_distances = compute_cumulative_distances(points)
+    return {
+        "encoded_polyline": route["geometry"],
+        "total_distance_miles": converter.meters_to_miles(route["distance"]),
+    }
+
+
+def get_route(
+    start_lat: float,
+    start_lng: float,
+    end_lat: float,
+    end_lng: float,
+) -> dict:
+    """
+    First OSRM call — base route from start to end.
+
+    Returns
+    -------
+    dict
+        ``encoded_polyline``     – encoded polyline of the route
+        ``points``               – ``(N, 2)`` float32 array of (lat, lng)
+        ``cumulative_distances`` – ``(N,)`` float64 array of miles from start
+        ``total_distance_miles`` – driving distance in miles
+
+    The route cache holds only the encoded polyline; points and
+    cumulative distances are decoded from it on every call, which is
+    far cheaper than moving the decoded arrays through the cache.
+    """
+    route = _fetch_route(start_lat, start_lng, end_lat, end_lng)
+    points, cumulative_distances = decode_polyline_with_distances(
+        route["encoded_polyline"]
+    )
 
     return {
-        "encoded_polyline": encoded_polyline,
+        "encoded_polyline": route["encoded_polyline"],
         "points": points,
         "cumulative_distances": cumulative_distances,
-        "total_distance_miles": total_distance_miles,
+        "total_distance_miles": route["total_distance_miles"],
     }
 
 
+@cache_route(waypoints_key)
 def get_route_with_waypoints(
     waypoints: list[tuple[float, float]],
 ) -> dict:
@@ -74,7 +123,7 @@ def get_route_with_waypoints(
     }
 
     logger.debug("OSRM waypoint call: %s", url)
-    response = requests.get(url, params=params, timeout=60)
+    response = _session.get(url, params=params, timeout=60)
     response.raise_for_status()
     data = response.json()
 
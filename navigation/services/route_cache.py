@@ -0,0 +1,64 @@
+"""Route cache — memoize OSRM responses in the default Django cache
+(Redis in production) keyed by endpoints rounded to 3 decimals (~100 m).
+
+Repeated city pairs are served from the cache instead of re-hitting
+OSRM.  Cache failures are logged and fall through to the real call.
+"""
+
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def route_key(start_lat, start_lng, end_lat, end_lng) -> str:
+    return (
+        f"osrm:route:{start_lat:.3f}:{start_lng:.3f}"
+        f":{end_lat:.3f}:{end_lng:.3f}"
+    )
+
+
+def waypoints_key(waypoints) -> str:
+    coords = ";".join(f"{lat:.3f},{lng:.3f}" for lat, lng in waypoints)
+    digest = hashlib.blake2b(coords.encode(), digest_size=16).hexdigest()
+    return f"osrm:waypoints:{digest}"
+
+
+def cache_route(make_key):
+    """
+    Decorate an OSRM call so its result is cached under
+    ``make_key(*args, **kwargs)`` for ``settings.ROUTE_CACHE_TIMEOUT``.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(*args, **kwargs)
+
+            try:
+                result = cache.get(key)
+            except Exception as e:
+                logger.warning("Route cache read failed for %s: %s", key, e)
+                result = None
+
+            if result is not None:
+                logger.debug("Route cache hit: %s", key)
+                return result
+
+            logger.debug("Route cache miss: %s", key)
+            result = func(*args, **kwargs)
+
+            try:
+                cache.set(key, result, settings.ROUTE_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning("Route cache write failed for %s: %s", key, e)
+
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,238 @@
+"""Station index — an in-memory snapshot of every ``GasStation``, bucketed
+on a fixed lat/lng grid so route queries gather candidate stations with
+a few array lookups instead of a corridor query per request.
+
+The snapshot is built lazily once per process and rebuilt whenever the
+``station_index:version`` key in the default cache changes.  Saving or
+deleting a station bumps that key (see the signal handlers below), and
+so does ``import_gasstations``, whose bulk writes send no signals.
+Other processes only see the bump through a shared cache backend
+(``REDIS_URL``); with the local-memory fallback each process keeps its
+snapshot until it restarts.
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from gasstation.models import GasStation
+
+from .helper import BOX_CELL_DEG, BOX_GRID_COLS, box_cell_keys
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "station_index:version"
+
+# Most cells searched around each route point on the ``BOX_CELL_DEG``
+# grid.  The route is densified to one point per cell, so a radius of
+# two cells covers everything within ~0.75° of the line — beyond what
+# the projection prefilter (0.4° / 0.5°) ever keeps.
+NEIGHBOUR_CELLS = 2
+MILES_PER_DEGREE = 69.0
+
+_index = None
+_version = None
+_lock = threading.Lock()
+
+# Background loader used by ``prefetch``.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="station-index")
+
+
+class StationIndex:
+    """
+    Column arrays for all stations plus a grid lookup table.
+
+    Stations are ordered by grid cell, so the stations of one cell are a
+    contiguous slice found with ``np.searchsorted``.
+    """
+
+    def __init__(self, ids, names, lats, lngs, prices):
+        cells = box_cell_keys(lats, lngs)
+        order = np.argsort(cells, kind="stable")
+
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        # float32 resolves coordinates to about a metre, plenty for
+        # mile-scale corridor checks, at half the memory of float64.
+        self.lats = np.asarray(lats, dtype=np.float32)[order]
+        self.lngs = np.asarray(lngs, dtype=np.float32)[order]
+        self.prices = np.asarray(prices, dtype=np.float64)[order]
+        self.cells = cells[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def near(self, route_lats, route_lngs, corridor_miles=None) -> np.ndarray:
+        """
+        Return the sorted row indices of stations in the grid cells
+        within *corridor_miles* of the route polyline (at most
+        ``NEIGHBOUR_CELLS`` cells; the maximum when not given).
+        """
+        lats, lngs = _densify(route_lats, route_lngs)
+        radius = _radius_cells(lats, corridor_miles)
+        keys = box_cell_keys(lats, lngs)
+        offsets = np.arange(-radius, radius + 1)
+        block = (
+            keys[:, None, None]
+            + offsets[None, :, None] * BOX_GRID_COLS
+            + offsets[None, None, :]
+        )
+        cells = np.unique(block)
+
+        starts = np.searchsorted(self.cells, cells, side="left")
+        ends = np.searchsorted(self.cells, cells, side="right")
+        hit = ends > starts
+        if not hit.any():
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate(
+            [np.arange(s, e) for s, e in zip(starts[hit], ends[hit])]
+        )
+
+
+def _radius_cells(lats, corridor_miles) -> int:
+    """
+    Number of cells to search around each densified route point so that
+    every station within *corridor_miles* of the line is covered.
+    """
+    if corridor_miles is None or len(lats) == 0:
+        return NEIGHBOUR_CELLS
+
+    # Degrees of longitude shrink with latitude; size for the worst case.
+    cos_lat = np.cos(np.radians(min(float(np.abs(lats).max()), 89.0)))
+    reach = corridor_miles / (MILES_PER_DEGREE * cos_lat) + BOX_CELL_DEG / 2
+    return int(min(NEIGHBOUR_CELLS, np.ceil(reach / BOX_CELL_DEG)))
+
+
+def _densify(lats, lngs):
+    """
+    Insert points along the polyline so consecutive points are at most
+    ``BOX_CELL_DEG`` apart on either axis.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if len(lats) < 2:
+        return lats, lngs
+
+    d_lat = np.diff(lats)
+    d_lng = np.diff(lngs)
+    steps = np.maximum(
+        1, np.ceil(np.maximum(np.abs(d_lat), np.abs(d_lng)) / BOX_CELL_DEG)
+    ).astype(np.int64)
+
+    seg = np.repeat(np.arange(len(steps)), steps)
+    first = np.repeat(np.cumsum(steps) - steps, steps)
+    t = (np.arange(len(seg)) - first) / steps[seg]
+
+    return (
+        np.append(lats[seg] + t * d_lat[seg], lats[-1]),
+        np.append(lngs[seg] + t * d_lng[seg], lngs[-1]),
+    )
+
+
+def _coordinate(function):
+    """``ST_X`` / ``ST_Y`` of the station location as a plain float."""
+    return Func(
+        F("location"),
+        function=function,
+        template="%(function)s(%(expressions)s::geometry)",
+        output_field=FloatField(),
+    )
+
+
+def _build() -> StationIndex:
+    # Pull only the columns the index needs, with coordinates extracted
+    # and the price cast to float in SQL, so no model instances, GEOS
+    # points or Decimals are created per row.
+    rows = list(
+        GasStation.objects.annotate(
+            lat=_coordinate("ST_Y"),
+            lng=_coordinate("ST_X"),
+            price=Cast("retail_price", FloatField()),
+        ).values_list("opis_id", "name", "price", "lat", "lng")
+    )
+    ids, names, prices, lats, lngs = zip(*rows) if rows else ([],) * 5
+
+    logger.info("Built station index with %d stations", len(ids))
+    return StationIndex(ids, names, lats, lngs, prices)
+
+
+def _current_version():
+    try:
+        return cache.get(VERSION_KEY)
+    except Exception as e:
+        logger.warning("Station index version read failed: %s", e)
+        return _version
+
+
+def get_index() -> StationIndex:
+    """Return the process-wide index, rebuilding it if it is stale."""
+    global _index, _version
+
+    version = _current_version()
+    index = _index
+    if index is None or version != _version:
+        with _lock:
+            index = _index
+            if index is None or version != _version:
+                index = _index = _build()
+                _version = version
+    return index
+
+
+def _load_in_background():
+    try:
+        get_index()
+    except Exception:
+        logger.exception("Background station index load failed")
+    finally:
+        # The worker thread got its own connection; don't leave it open.
+        connection.close()
+
+
+def prefetch():
+    """
+    Start rebuilding a missing or stale index in a background thread.
+
+    Views call this before their OSRM request so the station query
+    overlaps the HTTP round trip.  A later ``get_index`` waits on the
+    same lock and picks up the fresh index.
+    """
+    if _index is None or _current_version() != _version:
+        _executor.submit(_load_in_background)
+
+
+def invalidate():
+    """Mark every process's index as stale."""
+    global _index
+
+    _index = None
+    if isinstance(caches["default"], (LocMemCache, DummyCache)):
+        logger.warning(
+            "Station index invalidated on a process-local cache backend; "
+            "other processes keep their index until restart. Set REDIS_URL "
+            "to share the version key."
+        )
+    try:
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception as e:
+        logger.warning("Station index version write failed: %s", e)
+
+
+@receiver(post_save, sender=GasStation)
+@receiver(post_delete, sender=GasStation)
+def _invalidate_on_change(sender, **kwargs):
+    # Bump the version only once the write is visible to other workers,
+    # or one could rebuild from the old rows under the new version.
+    transaction.on_commit(invalidate)
@@ -1,19 +1,149 @@
 import logging
+from dataclasses import dataclass, fields
 
+import numpy as np
 from django.conf import settings
-from django.contrib.gis.geos import Polygon
 
-from gasstation.models import GasStation
-from .helper import haversine, project_point_onto_segment
+from . import station_index
+from .helper import nearest_points_on_route, project_points_onto_route
 
 logger = logging.getLogger(__name__)
 
 
-def get_stations_along_route(
+@dataclass(frozen=True)
+class StationBatch:
+    """
+    Stations projected onto a route, stored column-wise and sorted by
+    ``distance_from_start``.  Coordinates are float32; distances and
+    prices stay float64 since they feed the cost arithmetic.  Batches
+    are immutable; ``take`` returns a reordered copy.
+
+    Indexing or iterating yields one station dict per row with the keys
+    ``id``, ``name``, ``lat``, ``lng``, ``price``,
+    ``distance_from_start`` and ``distance_from_route``.
+    """
+
+    ids: np.ndarray
+    names: np.ndarray  # object array of str
+    lats: np.ndarray
+    lngs: np.ndarray
+    prices: np.ndarray
+    distance_from_start: np.ndarray
+    distance_from_route: np.ndarray
+
+    @classmethod
+    def from_dicts(cls, stations: list[dict]) -> "StationBatch":
+        """
+        Build a batch from station dicts.  ``id`` must be an integer and
+        ``lat``, ``lng``, ``price`` and ``distance_from_start`` numbers;
+        a missing or non-numeric value raises ``ValueError``.
+        """
+        return cls(
+            ids=_numeric_column(stations, "id", np.int64, kinds="iu"),
+            names=np.array([s.get("name", "") for s in stations], dtype=object),
+            lats=_numeric_column(stations, "lat", np.float32),
+            lngs=_numeric_column(stations, "lng", np.float32),
+            prices=_numeric_column(stations, "price", np.float64),
+            distance_from_start=_numeric_column(
+                stations, "distance_from_start", np.float64
+            ),
+            distance_from_route=np.array(
+                [s.get("distance_from_route", 0.0) for s in stations],
+                dtype=np.float64,
+            ),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, order) -> "StationBatch":
+        """Return a batch with every column reindexed by *order*."""
+        return StationBatch(
+            **{f.name: getattr(self, f.name)[order] for f in fields(self)}
+        )
+
+    def __getitem__(self, i) -> dict:
+        return {
+            "id": int(self.ids[i]),
+            "name": self.names[i],
+            # Round away float32 noise (6 decimals ≈ 0.1 m).
+            "lat": round(float(self.lats[i]), 6),
+            "lng": round(float(self.lngs[i]), 6),
+            "price": float(self.prices[i]),
+            "distance_from_start": float(self.distance_from_start[i]),
+            "distance_from_route": float(self.distance_from_route[i]),
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _numeric_column(stations, key, dtype, kinds="iuf") -> np.ndarray:
+    """Column *key* of *stations* as *dtype*, without coercing non-numbers."""
+    try:
+        column = np.array([s[key] for s in stations])
+    except KeyError:
+        raise ValueError(f"Station is missing {key!r}") from None
+    if column.size and column.dtype.kind not in kinds:
+        raise ValueError(f"Station {key!r} values must be numeric")
+    return column.astype(dtype)
+
+
+def _make_batch(index, rows, along, off_route) -> StationBatch:
+    """Build a sorted ``StationBatch`` from station-index rows."""
+    order = np.argsort(along, kind="stable")
+    rows = rows[order]
+    return StationBatch(
+        ids=index.ids[rows],
+        names=index.names[rows],
+        lats=index.lats[rows],
+        lngs=index.lngs[rows],
+        prices=index.prices[rows],
+        distance_from_start=along[order],
+        distance_from_route=np.round(off_route[order], 2),
+    )
+
+
+def _sample_route(route_points, cumulative_distances) -> np.ndarray:
+    """
+    Sub-sample the route to at most ~2000 evenly spaced points (always
+    keeping the last one).
+
+    Accepts lists or NumPy arrays and returns a ``(K, 3)`` float64 array
+    of ``(lat, lng, cumulative_distance)`` rows.
+    """
+    # Only the kept rows are widened to float64; a float32 route array
+    # is not copied in full first.
+    points = np.asarray(route_points).reshape(-1, 2)
+    cumulative = np.asarray(cumulative_distances)
+
+    total_points = len(points)
+    step = max(1, total_points // 2000)
+    indices = np.arange(0, total_points, step)
+    if indices[-1] != total_points - 1:
+        indices = np.append(indices, total_points - 1)
+
+    return np.column_stack(
+        (points[indices], cumulative[indices])
+    ).astype(np.float64, copy=False)
+
+
+def _stations_near_route(sampled, max_station_distance):
+    """
+    Return the station index and the rows of the stations in the grid
+    cells within *max_station_distance* of the sampled route.
+    """
+    index = station_index.get_index()
+    rows = index.near(sampled[:, 0], sampled[:, 1], max_station_distance)
+    return index, rows
+
+
+def project_stations(
     route_points: list[tuple[float, float]],
     cumulative_distances: list[float],
     max_station_distance: float | None = None,
-) -> list[dict]:
+    method: str = "segment",
+) -> StationBatch:
     """
     Project gas stations from the database onto the route.
 
@@ -22,192 +152,83 @@ def get_stations_along_route(
     constraint (consecutive stops ≤ 500 mi apart).
 
     Algorithm:
-      1. Compute a bounding box around the route polyline.
-      2. Expand it slightly to capture nearby stations.
-      3. Query the DB for stations within the bounding box.
-      4. For each station, find its closest route point and assign
-         ``distance_from_start``.
-      5. Remove stations that are too far from the route.
-      6. Sort by ``distance_from_start``.
+      1. Sub-sample the route polyline.
+      2. Look up candidate stations in the in-memory station index.
+      3. Assign each station a ``distance_from_start``:
+         ``"nearest"`` (v1) takes the cumulative distance of its closest
+         sampled route point; ``"segment"`` (v2) projects it onto its
+         closest route segment A→B, giving *t ∈ [0, 1]*, and
+         interpolates ``cum_A + t × (cum_B − cum_A)``.  Segment
+         projection is more accurate on curvy routes or when a station
+         sits between two widely-spaced sample points.
+      4. Remove stations that are too far from the route.
+      5. Sort by ``distance_from_start``.
 
     Parameters
     ----------
     route_points :
-        Decoded polyline as [(lat, lng), …].
+        Decoded polyline as [(lat, lng), …] or an ``(N, 2)`` array.
     cumulative_distances :
-        Cumulative driving distance (miles) for each polyline point.
+        Cumulative driving distance (miles) for each polyline point,
+        as a list or array.
     max_station_distance :
         Maximum perpendicular distance (miles) from the route to keep
         a station.  Default from settings.
+    method :
+        ``"segment"`` (default) or ``"nearest"``.
 
     Returns
     -------
-    list[dict]
-        Sorted list of station dicts with keys:
-        ``id``, ``name``, ``lat``, ``lng``, ``price``,
+    StationBatch
+        Stations sorted by ``distance_from_start``, as parallel arrays
+        ``ids``, ``names``, ``lats``, ``lngs``, ``prices``,
         ``distance_from_start``, ``distance_from_route``.
     """
+    if method not in ("segment", "nearest"):
+        raise ValueError(f"Unknown projection method: {method!r}")
+
     config = settings.FUEL_OPTIMIZER
     if max_station_distance is None:
         max_station_distance = config["MAX_STATION_DISTANCE_FROM_ROUTE_MILES"]
-    lats = [p[0] for p in route_points]
-    lngs = [p[1] for p in route_points]
-    padding = 0.5 
-    min_lat, max_lat = min(lats) - padding, max(lats) + padding
-    min_lng, max_lng = min(lngs) - padding, max(lngs) + padding
-    bbox = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
-    bbox.srid = 4326
-
-    stations_qs = GasStation.objects.filter(location__within=bbox)
-    bbox_count = stations_qs.count()
-    logger.info("Stations within bounding box: %d", bbox_count)
-    total_points = len(route_points)
-    step = max(1, total_points // 2000)
-    sampled_indices = list(range(0, total_points, step))
-    if sampled_indices[-1] != total_points - 1:
-        sampled_indices.append(total_points - 1)
-
-    sampled = [
-        (route_points[i][0], route_points[i][1], cumulative_distances[i])
-        for i in sampled_indices
-    ]
-    logger.debug("Using %d sampled route points for projection", len(sampled))
-
-    projected: list[dict] = []
-
-    for station in stations_qs.iterator():
-        station_lat = station.location.y
-        station_lng = station.location.x
-
-        best_dist = float("inf")
-        best_cum = 0.0
-
-        for pt_lat, pt_lng, cum_dist in sampled:
-            if (
-                abs(pt_lat - station_lat) > 0.4
-                or abs(pt_lng - station_lng) > 0.5
-            ):
-                continue
-            d = haversine(station_lat, station_lng, pt_lat, pt_lng)
-            if d < best_dist:
-                best_dist = d
-                best_cum = cum_dist
-
-        if best_dist <= max_station_distance:
-            projected.append(
-                {
-                    "id": station.opis_id,
-                    "name": station.name,
-                    "lat": station_lat,
-                    "lng": station_lng,
-                    "price": float(station.retail_price),
-                    "distance_from_start": best_cum,
-                    "distance_from_route": round(best_dist, 2),
-                }
-            )
-    projected.sort(key=lambda s: s["distance_from_start"])
-
-    logger.info("Stations projected onto route: %d", len(projected))
-    return projected
 
-def get_stations_along_route_v2(
-    route_points: list[tuple[float, float]],
-    cumulative_distances: list[float],
-    max_station_distance: float | None = None,
-) -> list[dict]:
-    """
-    Project gas stations onto the route using **perpendicular segment
-    projection** instead of nearest-point lookup.
+    sampled = _sample_route(route_points, cumulative_distances)
+    logger.debug(
+        "[%s] Using %d sampled route points for projection", method, len(sampled)
+    )
 
-    For every route segment A→B the station is projected onto the line,
-    giving a parameter *t ∈ [0, 1]*.  The cumulative distance at the
-    projection is interpolated as ``cum_A + t × (cum_B − cum_A)``.
+    index, rows = _stations_near_route(sampled, max_station_distance)
+    logger.info("[%s] Stations within route corridor: %d", method, len(rows))
 
-    This yields a more accurate ``distance_from_start`` than v1's
-    nearest-sampled-point approach, especially on curvy routes or when
-    stations sit between two widely-spaced sample points.
+    project = (
+        nearest_points_on_route if method == "nearest"
+        else project_points_onto_route
+    )
+    along, off_route = project(
+        index.lats[rows], index.lngs[rows],
+        sampled[:, 0], sampled[:, 1], sampled[:, 2],
+        0.4, 0.5,
+    )
 
-    The rest of the pipeline (bounding-box query, sub-sampling, sorting)
-    is identical to v1.
-    """
-    config = settings.FUEL_OPTIMIZER
-    if max_station_distance is None:
-        max_station_distance = config["MAX_STATION_DISTANCE_FROM_ROUTE_MILES"]
+    keep = off_route <= max_station_distance
+    projected = _make_batch(index, rows[keep], along[keep], off_route[keep])
+
+    logger.info("[%s] Stations projected onto route: %d", method, len(projected))
+    return projected
 
-    lats = [p[0] for p in route_points]
-    lngs = [p[1] for p in route_points]
-    padding = 0.5
-    min_lat, max_lat = min(lats) - padding, max(lats) + padding
-    min_lng, max_lng = min(lngs) - padding, max(lngs) + padding
 
-    bbox = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
-    bbox.srid = 4326
+def get_stations_along_route(
+    route_points, cumulative_distances, max_station_distance=None,
+) -> StationBatch:
+    """v1 projection: ``project_stations`` with ``method="nearest"``."""
+    return project_stations(
+        route_points, cumulative_distances, max_station_distance, "nearest"
+    )
 
-    stations_qs = GasStation.objects.filter(location__within=bbox)
-    bbox_count = stations_qs.count()
-    logger.info("[v2] Stations within bounding box: %d", bbox_count)
 
-    total_points = len(route_points)
-    step = max(1, total_points // 2000)
-    sampled_indices = list(range(0, total_points, step))
-    if sampled_indices[-1] != total_points - 1:
-        sampled_indices.append(total_points - 1)
-
-    sampled = [
-        (route_points[i][0], route_points[i][1], cumulative_distances[i])
-        for i in sampled_indices
-    ]
-    logger.debug("[v2] Using %d sampled route points for projection", len(sampled))
-
-    projected: list[dict] = []
-
-    for station in stations_qs.iterator():
-        station_lat = station.location.y
-        station_lng = station.location.x
-
-        best_dist = float("inf")
-        best_cum = 0.0
-
-        for k in range(len(sampled) - 1):
-            a_lat, a_lng, a_cum = sampled[k]
-            b_lat, b_lng, b_cum = sampled[k + 1]
-
-            seg_min_lat = min(a_lat, b_lat) - 0.4
-            seg_max_lat = max(a_lat, b_lat) + 0.4
-            seg_min_lng = min(a_lng, b_lng) - 0.5
-            seg_max_lng = max(a_lng, b_lng) + 0.5
-
-            if not (
-                seg_min_lat <= station_lat <= seg_max_lat
-                and seg_min_lng <= station_lng <= seg_max_lng
-            ):
-                continue
-
-            t, proj_lat, proj_lng = project_point_onto_segment(
-                station_lat, station_lng,
-                a_lat, a_lng,
-                b_lat, b_lng,
-            )
-
-            d = haversine(station_lat, station_lng, proj_lat, proj_lng)
-
-            if d < best_dist:
-                best_dist = d
-                best_cum = a_cum + t * (b_cum - a_cum)
-
-        if best_dist <= max_station_distance:
-            projected.append(
-                {
-                    "id": station.opis_id,
-                    "name": station.name,
-                    "lat": station_lat,
-                    "lng": station_lng,
-                    "price": float(station.retail_price),
-                    "distance_from_start": best_cum,
-                    "distance_from_route": round(best_dist, 2),
-                }
-            )
-
-    projected.sort(key=lambda s: s["distance_from_start"])
-    logger.info("[v2] Stations projected onto route: %d", len(projected))
-    return projected
+def get_stations_along_route_v2(
+    route_points, cumulative_distances, max_station_distance=None,
+) -> StationBatch:
+    """v2 projection: ``project_stations`` with ``method="segment"``."""
+    return project_stations(
+        route_points, cumulative_distances, max_station_distance, "segment"
+    )
@@ -4,9 +4,13 @@ Unit tests for the fuel-cost optimizer (forward DP).
 These are pure-logic tests — no database, no network.
 """
 
-from django.test import TestCase, override_settings
+import random
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
 
 from navigation.services.optimizer import optimize_fuel_stops
+from navigation.services.stations import StationBatch
 
 FUEL_SETTINGS = {
     "MAX_RANGE_MILES": 500,
@@ -19,7 +23,7 @@ FUEL_SETTINGS = {
 
 
 @override_settings(FUEL_OPTIMIZER=FUEL_SETTINGS)
-class OptimizerTests(TestCase):
+class OptimizerTests(SimpleTestCase):
     """Test optimize_fuel_stops with synthetic station data."""
 
     def _make_station(self, sid, distance, price):
@@ -67,6 +71,18 @@ class OptimizerTests(TestCase):
         self.assertAlmostEqual(result["total_fuel_cost"], 0.0, places=2)
         self.assertAlmostEqual(result["total_gallons"], 30.0, places=2)
 
+    def test_gap_equal_to_range_is_reachable(self):
+        """The range window keeps predecessors exactly max_range behind."""
+        stations = [
+            self._make_station(1, 500.0, 3.00),
+            self._make_station(2, 1000.0, 3.00),
+        ]
+        result = optimize_fuel_stops(stations, total_distance=1500.0)
+        self.assertEqual([s["station_id"] for s in result["fuel_stops"]], [1, 2])
+
+        with self.assertRaises(ValueError):
+            optimize_fuel_stops(stations, total_distance=1500.5)
+
     def test_custom_vehicle_params(self):
         stations = [
             self._make_station(1, 200.0, 4.00),
@@ -108,6 +124,54 @@ class OptimizerTests(TestCase):
         ):
             self.assertIn(key, stop)
 
+    def test_unsorted_input_is_sorted_first(self):
+        stations = [
+            self._make_station(1, 200.0, 5.00),
+            self._make_station(2, 400.0, 2.00),
+            self._make_station(3, 700.0, 4.00),
+        ]
+        expected = optimize_fuel_stops(stations, total_distance=900.0)
+        result = optimize_fuel_stops(stations[::-1], total_distance=900.0)
+        self.assertEqual(result, expected)
+
+    def test_sorted_batch_is_not_resorted(self):
+        batch = StationBatch.from_dicts([
+            self._make_station(1, 200.0, 5.00),
+            self._make_station(2, 400.0, 2.00),
+            self._make_station(3, 700.0, 4.00),
+        ])
+        with mock.patch.object(StationBatch, "take") as take:
+            optimize_fuel_stops(batch, total_distance=950.0)
+        take.assert_not_called()
+
+    def test_missing_or_non_numeric_fields_raise(self):
+        missing = self._make_station(1, 300.0, 3.50)
+        del missing["lat"]
+        with self.assertRaises(ValueError):
+            optimize_fuel_stops([missing], total_distance=700.0)
+
+        with self.assertRaises(ValueError):
+            optimize_fuel_stops(
+                [self._make_station("A1", 300.0, 3.50)], total_distance=700.0
+            )
+
+    def test_memoized_result_tracks_prices(self):
+        stations = [
+            self._make_station(1, 300.0, 3.50),
+            self._make_station(2, 450.0, 3.00),
+        ]
+        first = optimize_fuel_stops(stations, total_distance=700.0)
+        first["fuel_stops"][0]["cost"] = -1
+
+        again = optimize_fuel_stops(stations, total_distance=700.0)
+        self.assertGreater(again["fuel_stops"][0]["cost"], 0)
+
+        stations[1]["price"] = 4.00
+        repriced = optimize_fuel_stops(stations, total_distance=700.0)
+        self.assertNotEqual(
+            repriced["total_fuel_cost"], again["total_fuel_cost"]
+        )
+
     def test_short_route_zero_cost(self):
         """If total_distance ≤ max_range the truck goes straight through."""
         stations = [
@@ -119,3 +183,31 @@ class OptimizerTests(TestCase):
         self.assertEqual(result["total_fuel_cost"], 0.0)
         self.assertAlmostEqual(result["total_gallons"], 45.0, places=2)
         self.assertAlmostEqual(result["total_distance"], 450.0, places=1)
+
+    def test_matches_all_pairs_dp(self):
+        """The pruned window must find the same cost as trying every pair."""
+        rng = random.Random(7)
+        total = 2000.0
+        stations = sorted(
+            (
+                self._make_station(
+                    i, rng.choice([rng.uniform(0, total), 500.0]),
+                    rng.choice([3.0, 3.5, rng.uniform(2.5, 5.0)]),
+                )
+                for i in range(80)
+            ),
+            key=lambda s: s["distance_from_start"],
+        )
+
+        dists = [0.0] + [s["distance_from_start"] for s in stations] + [total]
+        prices = [0.0] + [s["price"] for s in stations] + [0.0]
+        dp = [float("inf")] * len(dists)
+        dp[0] = 0.0
+        for j in range(1, len(dists)):
+            for i in range(j):
+                gap = dists[j] - dists[i]
+                if 0 < gap <= 500:
+                    dp[j] = min(dp[j], dp[i] + gap / 10 * prices[i])
+
+        result = optimize_fuel_stops(stations, total_distance=total)
+        self.assertAlmostEqual(result["total_fuel_cost"], round(dp[-1], 2), places=2)
@@ -4,12 +4,26 @@ Unit tests for the station-projection service.
 Uses Django's test framework with an in-memory PostGIS database.
 """
 
-from django.test import TestCase, override_settings
+from concurrent.futures import ThreadPoolExecutor
+
+import numba
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.contrib.gis.geos import Point
 
 from gasstation.models import GasStation
+from navigation.services.station_index import StationIndex
 from navigation.services.stations import get_stations_along_route
-from navigation.services.helper import haversine, compute_cumulative_distances
+from navigation.services.helper import (
+    box_cell_keys,
+    box_grid,
+    compute_cumulative_distances,
+    decode_polyline,
+    decode_polyline_with_distances,
+    haversine,
+    nearest_points_on_route,
+    project_points_onto_route,
+)
 
 FUEL_SETTINGS = {
     "MAX_RANGE_MILES": 500,
@@ -98,7 +112,7 @@ class StationsServiceTests(TestCase):
                 self.assertIn(key, station)
 
 
-class HaversineTests(TestCase):
+class HaversineTests(SimpleTestCase):
     """Sanity-check the haversine helper."""
 
     def test_same_point_zero(self):
@@ -115,3 +129,95 @@ class HaversineTests(TestCase):
         self.assertEqual(cum[0], 0.0)
         self.assertGreater(cum[1], 0)
         self.assertGreater(cum[2], cum[1])
+
+    def test_fused_decode_matches_separate_passes(self):
+        encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        points, cum = decode_polyline_with_distances(encoded)
+        np.testing.assert_array_equal(points, decode_polyline(encoded))
+        np.testing.assert_allclose(
+            cum, compute_cumulative_distances(points), rtol=1e-6
+        )
+
+
+    def test_truncated_polyline_raises(self):
+        for encoded in ("_p~iF~ps|U_", "~"):
+            with self.assertRaises(ValueError):
+                decode_polyline(encoded)
+            with self.assertRaises(ValueError):
+                decode_polyline_with_distances(encoded)
+
+class BoxGridTests(SimpleTestCase):
+    """Bucketing of bounding boxes on the projection grid."""
+
+    def test_boxes_listed_under_every_overlapped_cell(self):
+        keys, items = box_grid(
+            np.array([40.0, 40.1, 30.0]), np.array([41.2, 40.2, 30.1]),
+            np.array([-90.0, -89.9, -95.0]), np.array([-89.6, -89.8, -94.9]),
+        )
+        for lat, lng, expected in [
+            (40.1, -89.9, [0, 1]),
+            (41.1, -89.7, [0]),
+            (35.0, -92.0, []),
+        ]:
+            key = box_cell_keys([lat], [lng])[0]
+            lo = np.searchsorted(keys, key, side="left")
+            hi = np.searchsorted(keys, key, side="right")
+            self.assertEqual(list(items[lo:hi]), expected)
+
+
+class ParallelKernelTests(SimpleTestCase):
+    """The ``parallel=True`` kernels are called from request threads."""
+
+    def _route_args(self):
+        rng = np.random.default_rng(0)
+        route_lats = np.linspace(35.0, 40.0, 500)
+        route_lngs = np.linspace(-100.0, -90.0, 500)
+        return (
+            rng.uniform(35.0, 40.0, 2000).astype(np.float32),
+            rng.uniform(-100.0, -90.0, 2000).astype(np.float32),
+            route_lats, route_lngs, np.linspace(0.0, 700.0, 500),
+            0.4, 0.5,
+        )
+
+    def _assert_thread_safe(self, kernel):
+        self.assertIn(numba.threading_layer(), ("tbb", "omp"))
+        args = self._route_args()
+        expected = kernel(*args)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: kernel(*args), range(8)))
+        for along, dist in results:
+            np.testing.assert_array_equal(along, expected[0])
+            np.testing.assert_array_equal(dist, expected[1])
+
+    def test_segment_projection_from_concurrent_threads(self):
+        self._assert_thread_safe(project_points_onto_route)
+
+    def test_nearest_point_search_from_concurrent_threads(self):
+        self._assert_thread_safe(nearest_points_on_route)
+
+class StationIndexTests(SimpleTestCase):
+    """Grid lookup of candidate stations along a route."""
+
+    def setUp(self):
+        self.index = StationIndex(
+            ids=[1, 2, 3],
+            names=["Near", "Far", "Also Near"],
+            lats=[40.0, 30.0, 41.2],
+            lngs=[-85.0, -95.0, -82.0],
+            prices=[3.50, 2.99, 3.20],
+        )
+
+    def test_near_returns_stations_along_route(self):
+        rows = self.index.near(np.array([40.0, 40.0]), np.array([-90.0, -80.0]))
+        self.assertEqual(set(self.index.ids[rows]), {1, 3})
+
+    def test_near_empty_when_route_is_elsewhere(self):
+        rows = self.index.near(np.array([47.0]), np.array([-120.0]))
+        self.assertEqual(len(rows), 0)
+
+    def test_narrow_corridor_skips_distant_cells(self):
+        route = (np.array([40.0, 40.0]), np.array([-90.0, -80.0]))
+        wide = self.index.near(*route)
+        narrow = self.index.near(*route, corridor_miles=5)
+        self.assertEqual(set(self.index.ids[wide]), {1, 3})
+        self.assertEqual(set(self.index.ids[narrow]), {1})
@@ -35,6 +35,14 @@ INSTALLED_APPS = [
     "rest_framework",
     "django.contrib.gis",
 ]
+# Responses go out through DRF's JSONRenderer (compact output, no
+# indentation).  The browsable HTML renderer is only offered in DEBUG.
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        *(["rest_framework.renderers.BrowsableAPIRenderer"] if DEBUG else []),
+    ],
+}
 FUEL_OPTIMIZER = {
     "MAX_RANGE_MILES": 500,          
     "MPG": 10,
@@ -42,6 +50,17 @@ FUEL_OPTIMIZER = {
     "OSRM_BASE_URL": "http://router.project-osrm.org/route/v1/driving",
 }
 NOMINATIM_USER_AGENT=config("NOMINATIM_USER_AGENT", default="FuelOptimizer/1.0")
+NOMINATIM_URL=config("NOMINATIM_URL", default="https://nominatim.openstreetmap.org/search")
+# Self-hosted Nominatim used by import_gasstations without rate limiting,
+# e.g. "http://localhost:8080/search".  Empty = use NOMINATIM_URL.
+LOCAL_NOMINATIM_URL=config("LOCAL_NOMINATIM_URL", default="")
+# Concurrent geocoder requests per navigation request. Keep at 1 for the
+# public Nominatim (max 1 req/s); raise for a self-hosted instance.
+GEOCODE_CONCURRENCY = config("GEOCODE_CONCURRENCY", default=1, cast=int)
+GEOCODE_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+ROUTE_CACHE_TIMEOUT = 48 * 60 * 60
+OPTIMIZER_CACHE_TIMEOUT = 15 * 60
+REDIS_URL = config("REDIS_URL", default="")
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -83,6 +102,27 @@ DATABASES = {
     }
 }
 
+# The default cache carries the station index version between processes
+# (see navigation/services/station_index.py), so production needs
+# REDIS_URL; the local-memory fallback is only safe for one process.
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    ),
+    "geocode": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config("GEOCODE_CACHE_DIR", default=str(BASE_DIR / ".cache" / "geocode")),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {